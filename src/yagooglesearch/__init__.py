@@ -1,14 +1,50 @@
 # Standard Python libraries.
+import asyncio
+import atexit
+import datetime
+import email.utils
+import functools
+import itertools
 import logging
+import logging.handlers
 import os
+import queue
 import random
+import string
+import threading
 import time
 import urllib
+import weakref
 
 
 # Third party Python libraries.
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# BeautifulSoup parser.  The C-based lxml parser is much faster than Python's html.parser, which is only used if lxml is
+# not installed.
+try:
+    import lxml.etree
+    import lxml.html
+
+    BS4_PARSER = "lxml"
+except ImportError:
+    lxml = None
+    BS4_PARSER = "html.parser"
+
+# aiohttp is only required for AsyncSearchClient.
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# selectolax is optional and only used to speed up parsing the results when verbose_output is True.
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
 
 
 # Custom Python libraries.
@@ -21,43 +57,127 @@ ROOT_LOGGER = logging.getLogger("yagooglesearch")
 # ISO 8601 datetime format by default.
 LOG_FORMATTER = logging.Formatter("%(asctime)s [%(threadName)-12.12s] [%(levelname)s] %(message)s")
 
-# Setup file logging.
-log_file_handler = logging.FileHandler("yagooglesearch.py.log")
-log_file_handler.setFormatter(LOG_FORMATTER)
-ROOT_LOGGER.addHandler(log_file_handler)
+# Default handlers, kept as module attributes for backwards compatibility.  They are None until setup_logging()
+# creates them.
+log_file_handler = None
+console_handler = None
 
-# Setup console logging.
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(LOG_FORMATTER)
-ROOT_LOGGER.addHandler(console_handler)
+# Serializes setup_logging() calls.
+_setup_logging_lock = threading.Lock()
 
-USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.131 Safari/537.36"
 
-# Load the list of valid user agents from the install folder.  The search order is:
-# 1) user_agents.txt
-# 2) default USER_AGENT
-install_folder = os.path.abspath(os.path.split(__file__)[0])
+def setup_logging(log_file="yagooglesearch.py.log", console=True):
+    """Attach the default file and console handlers to the yagooglesearch logger.  Nothing is done if the logger
+    already has handlers, so importing yagooglesearch doesn't open a log file and scripts managing their own handlers
+    are left alone.  Called by SearchClient.__init__().
 
-try:
-    user_agents_file = os.path.join(install_folder, "user_agents.txt")
-    with open(user_agents_file, "r") as fh:
-        user_agents_list = [_.strip() for _ in fh.readlines()]
+    The handlers are driven by a background QueueListener thread, so file and console writes don't block the search
+    requests.  The listener is stopped, flushing any queued records, at interpreter exit.
+
+    :param str log_file: Log file path.  Set to None to disable file logging.
+    :param bool console: Log to the console.
+    """
 
-except Exception:
-    user_agents_list = [USER_AGENT]
+    global log_file_handler, console_handler
 
+    # The handlers check and addHandler() must be atomic, otherwise SearchClient objects created in parallel threads
+    # each attach their own handlers and every record is logged multiple times.
+    with _setup_logging_lock:
+        if ROOT_LOGGER.handlers:
+            return
+
+        handlers = []
+
+        # Setup file logging.
+        if log_file:
+            log_file_handler = logging.FileHandler(log_file)
+            log_file_handler.setFormatter(LOG_FORMATTER)
+            handlers.append(log_file_handler)
+
+        # Setup console logging.
+        if console:
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(LOG_FORMATTER)
+            handlers.append(console_handler)
+
+        if not handlers:
+            return
+
+        log_queue = queue.SimpleQueue()
+        ROOT_LOGGER.addHandler(logging.handlers.QueueHandler(log_queue))
+
+        log_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        log_listener.start()
+        atexit.register(log_listener.stop)
+
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.131 Safari/537.36"
+
+install_folder = os.path.abspath(os.path.split(__file__)[0])
 
 # Load the list of result languages.  Compiled by viewing the source code at https://www.google.com/advanced_search for
 # the supported languages.
 try:
     result_languages_file = os.path.join(install_folder, "result_languages.txt")
     with open(result_languages_file, "r") as fh:
-        result_languages_list = [_.strip().split("=")[0] for _ in fh.readlines()]
+        result_languages_list = [line.strip().split("=", 1)[0] for line in fh if line.strip()]
 
 except Exception as e:
     print(f"There was an issue loading the result languages file.  Exception: {e}")
     result_languages_list = []
 
+# Used for O(1) lang_result checks.  result_languages_list is kept for backwards compatibility.
+result_languages_set = frozenset(result_languages_list)
+
+# Only build the BeautifulSoup tree for the id "search" container that holds the search results.
+SEARCH_STRAINER = SoupStrainer(id="search")
+
+# Search result URLs with a netloc containing any of these are excluded.  "google" rather than "google." so Google
+# domains like googleusercontent.com are excluded too.
+GOOGLE_NETLOC_SUBSTRINGS = frozenset(("google",))
+
+# Links to Google's own pages and in-page anchors, rejected before any URL parsing.
+INTERNAL_LINK_PREFIXES = (
+    "#",
+    "javascript:",
+    "mailto:",
+    "/search?",
+    "/preferences",
+    "/advanced_search",
+    "/setprefs",
+)
+
+# Characters allowed in a URL scheme, see RFC 3986 section 3.1.
+URL_SCHEME_CHARACTERS = frozenset(string.ascii_letters + string.digits + "+-.")
+
+# Longest HTTP 429 Retry-After delay honored, so a bogus header can't stall a search indefinitely.
+RETRY_AFTER_MAX_DELAY_IN_SECONDS = 300
+
+# Larger responses are not downloaded, or abandoned once the body read exceeds it if there is no Content-Length, e.g.
+# chunked responses.  Google result pages are usually a few hundred KB.
+MAX_HTML_BYTES = 2 * 1024 * 1024
+
+# Size of the chunks the response body is read in, checking MAX_HTML_BYTES after each one.
+HTML_READ_CHUNK_BYTES = 64 * 1024
+
+# Client-side rate limit shared by every SearchClient and AsyncSearchClient object using the same TLD and proxy, so
+# concurrent searches don't amplify an HTTP 429 storm.  TOKEN_BUCKET_RATE is the sustained number of requests per second
+# and TOKEN_BUCKET_CAPACITY the number of requests allowed in a burst.  A single search, which waits at least
+# minimum_delay_between_paged_results_in_seconds between pages, is not slowed down by the defaults.  Set
+# TOKEN_BUCKET_RATE to None or 0 to disable the rate limiter.
+TOKEN_BUCKET_RATE = 0.5
+TOKEN_BUCKET_CAPACITY = 4
+
+# One _TokenBucket per (tld, proxy).
+_token_buckets = {}
+_token_buckets_lock = threading.Lock()
+
+# Maximum number of concurrent HTTP requests AsyncSearchClient objects sharing the same event loop are allowed to make.
+ASYNC_SEMAPHORE_LIMIT = 4
+
+# One asyncio.Semaphore per event loop, since a semaphore can't be shared across loops (e.g. repeated asyncio.run()).
+_async_semaphores = weakref.WeakKeyDictionary()
+
 
 def get_tbs(from_date, to_date):
     """Helper function to format the tbs parameter dates.  Note that verbatim mode also uses the &tbs= parameter, but
@@ -70,14 +190,248 @@ def get_tbs(from_date, to_date):
     :return: Dates encoded in tbs format.
     """
 
-    from_date = from_date.strftime("%m/%d/%Y")
-    to_date = to_date.strftime("%m/%d/%Y")
+    # MM/DD/YYYY, formatted directly instead of through the locale-aware strftime().
+    from_date = f"{from_date.month:02d}/{from_date.day:02d}/{from_date.year}"
+    to_date = f"{to_date.month:02d}/{to_date.day:02d}/{to_date.year}"
 
     formatted_tbs = f"cdr:1,cd_min:{from_date},cd_max:{to_date}"
 
     return formatted_tbs
 
 
+@functools.lru_cache(maxsize=None)
+def get_user_agents():
+    """Load the tuple of valid user agents from the install folder the first time a random user agent is needed, so
+    callers passing an explicit user_agent never read the file.  The search order is:
+    1) user_agents.txt
+    2) default USER_AGENT
+
+    :rtype: tuple
+    :return: User agent strings.
+    """
+
+    try:
+        user_agents_file = os.path.join(install_folder, "user_agents.txt")
+        with open(user_agents_file, "r") as fh:
+            # An empty file would leave nothing for random.choice() to pick from.
+            user_agents_tuple = tuple(line for line in fh.read().splitlines() if line) or (USER_AGENT,)
+
+    except Exception:
+        user_agents_tuple = (USER_AGENT,)
+
+    return user_agents_tuple
+
+
+def __getattr__(name):
+    """Lazily provide the user_agents_list module attribute, kept for backwards compatibility, without reading
+    user_agents.txt at import.  The list is created on first access and stored as a real module attribute, so calling
+    scripts can modify or replace it and assign_random_user_agent() picks from it.
+
+    :param str name: Module attribute name.
+
+    :rtype: list
+    :return: User agent strings from get_user_agents().
+    """
+
+    if name == "user_agents_list":
+        user_agents_list = globals().setdefault("user_agents_list", list(get_user_agents()))
+        return user_agents_list
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@functools.lru_cache(maxsize=256)
+def _normalize_lang_result(lang_result):
+    """Normalize the case of a search result language, e.g. "LANG_EN" => "lang_en" and "lang_zh-tw" => "lang_zh-TW".
+    Cached since only a handful of languages are ever used.
+
+    :param str lang_result: Search result language.
+
+    :rtype: str
+    :return: Normalized search result language.
+    """
+
+    if "-" not in lang_result:
+        return lang_result.lower()
+
+    language, region = lang_result.split("-", 1)
+
+    return f"{language.lower()}-{region.upper()}"
+
+
+def _extract_netloc(url):
+    """Extract the lowercase netloc from an absolute URL with string operations, which is much cheaper than
+    urllib.parse.urlparse() when only the netloc is needed.
+
+    :param str url: URL.
+
+    :rtype: str
+    :return: Lowercase netloc, or an empty string if the URL is not absolute.
+    """
+
+    scheme, separator, netloc = url.partition("://")
+
+    # Relative URLs, or URLs with "://" only in the path or query string, e.g. "/search?q=https://example.com".
+    if not separator or not scheme or not URL_SCHEME_CHARACTERS.issuperset(scheme):
+        return ""
+
+    for delimiter in "/?#":
+        netloc = netloc.partition(delimiter)[0]
+
+    return netloc.lower()
+
+
+def _parse_content_length(content_length):
+    """Parse the value of a Content-Length HTTP response header.
+
+    :param str content_length: Content-Length header value.
+
+    :rtype: int
+    :return: Body size in bytes, or None if the header is missing or malformed.
+    """
+
+    try:
+        return int(content_length)
+    except (TypeError, ValueError):
+        return None
+
+
+def _decode_html(body, charset):
+    """Decode a response body.  Google returns UTF-8, so charset detection is skipped and UTF-8 is used unless the
+    response explicitly declares a charset.  Undecodable bytes are replaced, just like requests' response.text.
+
+    :param bytes body: Response body.
+    :param str charset: Charset declared in the Content-Type response header, if any.
+
+    :rtype: str
+    :return: Decoded response body.
+    """
+
+    try:
+        return body.decode(charset or "utf-8", errors="replace")
+    # Unknown charset.
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
+
+
+def _parse_retry_after(retry_after):
+    """Parse the value of a Retry-After HTTP response header, which is either a non-negative integer number of seconds
+    (delta-seconds) or an HTTP-date, see RFC 9110 section 10.2.3.
+
+    :param str retry_after: Retry-After header value.
+
+    :rtype: float
+    :return: Seconds to wait before retrying, capped at RETRY_AFTER_MAX_DELAY_IN_SECONDS, or None if the header is
+        missing or can't be parsed.
+    """
+
+    if not retry_after:
+        return None
+
+    retry_after = retry_after.strip()
+
+    # Only plain ASCII digits are valid delta-seconds.  float() would also accept "inf", "nan", "1e400", etc.  The int
+    # is capped before converting it, since huge values overflow a float.
+    if retry_after.isascii() and retry_after.isdigit():
+        return float(min(int(retry_after), RETRY_AFTER_MAX_DELAY_IN_SECONDS))
+
+    try:
+        retry_after_datetime = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+
+    # HTTP-dates are always GMT, but parsedate_to_datetime() returns a naive datetime for "-0000" offsets.
+    if retry_after_datetime.tzinfo is None:
+        retry_after_datetime = retry_after_datetime.replace(tzinfo=datetime.timezone.utc)
+
+    retry_after_delay = (retry_after_datetime - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+
+    return float(min(max(0.0, retry_after_delay), RETRY_AFTER_MAX_DELAY_IN_SECONDS))
+
+
+def get_async_semaphore():
+    """Retrieve the asyncio.Semaphore shared by all AsyncSearchClient objects running on the current event loop.
+
+    :rtype: asyncio.Semaphore
+    :return: Semaphore limiting concurrent HTTP requests to ASYNC_SEMAPHORE_LIMIT.
+    """
+
+    loop = asyncio.get_event_loop()
+
+    semaphore = _async_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(ASYNC_SEMAPHORE_LIMIT)
+        _async_semaphores[loop] = semaphore
+
+    return semaphore
+
+
+def get_token_bucket(tld, proxy):
+    """Retrieve the token bucket rate limiter shared by all clients searching the given TLD through the given proxy.
+
+    :param str tld: Top level domain.
+    :param str proxy: HTTP(S) or SOCKS5 proxy, or an empty string.
+
+    :rtype: _TokenBucket
+    :return: Token bucket created with TOKEN_BUCKET_RATE and TOKEN_BUCKET_CAPACITY.
+    """
+
+    with _token_buckets_lock:
+        token_bucket = _token_buckets.get((tld, proxy))
+        if token_bucket is None:
+            token_bucket = _TokenBucket(TOKEN_BUCKET_RATE, TOKEN_BUCKET_CAPACITY)
+            _token_buckets[(tld, proxy)] = token_bucket
+
+    return token_bucket
+
+
+class _TokenBucket:
+    def __init__(self, rate, capacity):
+        """
+        _TokenBucket
+        Thread-safe token bucket rate limiter, refilled using a monotonic clock.
+
+        :param float rate: Tokens added per second.  None or <= 0 disables rate limiting.
+        :param int capacity: Max number of tokens the bucket holds.
+        """
+
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token from the bucket.  If the bucket is empty, the token is borrowed from the future so callers are
+        served in order.
+
+        :rtype: float
+        :return: Seconds to wait before the token can be used.  Always 0.0 if rate limiting is disabled.
+        """
+
+        if self.rate is None or self.rate <= 0:
+            return 0.0
+
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+            self.last_refill = now
+            self.tokens -= 1
+
+            if self.tokens >= 0:
+                return 0.0
+
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        """Take a token from the bucket, sleeping until it can be used."""
+
+        delay = self.reserve()
+        if delay:
+            ROOT_LOGGER.info("Client-side rate limit reached, sleeping for %.2f seconds...", delay)
+            time.sleep(delay)
+
+
 class SearchClient:
     def __init__(
         self,
@@ -95,8 +449,12 @@ class SearchClient:
         minimum_delay_between_paged_results_in_seconds=7,
         user_agent=None,
         yagooglesearch_manages_http_429s=True,
-        http_429_cool_off_time_in_minutes=60,
-        http_429_cool_off_factor=1.1,
+        http_429_max_retries=5,
+        http_429_backoff_base_delay_in_seconds=1.0,
+        http_429_backoff_max_delay_in_seconds=30,
+        http_429_backoff_jitter=0.5,
+        http_429_cool_off_time_in_minutes=None,
+        http_429_cool_off_factor=None,
         proxy="",
         verify_ssl=True,
         verbosity=5,
@@ -116,9 +474,9 @@ class SearchClient:
         :param int num: Max number of results to pull back per page.  Capped at 100 by Google.
         :param str country: Country or region to focus the search on.  Similar to changing the TLD, but does not yield
             exactly the same results.  Only Google knows why...
-        :param dict extra_params: A dictionary of extra HTTP GET parameters, which must be URL encoded.  For example if
-            you don't want Google to filter similar results you can set the extra_params to {'filter': '0'} which will
-            append '&filter=0' to every query.
+        :param dict extra_params: A dictionary of extra HTTP GET parameters, which will be URL encoded.  For example if
+            you want Google to filter similar results you can set the extra_params to {'filter': '1'} which will
+            override the default '&filter=0' for every query.
         :param int max_search_result_urls_to_return: Max URLs to return for the entire Google search.
         :param int minimum_delay_between_paged_results_in_seconds: Minimum time to wait between HTTP requests for
             consecutive pages for the same search query.  The actual time will be a random value between this minimum
@@ -126,9 +484,16 @@ class SearchClient:
         :param str user_agent: Hard-coded user agent for the HTTP requests.
         :param bool yagooglesearch_manages_http_429s: Determines if yagooglesearch will handle HTTP 429 cool off and
            retries.  Disable if you want to manage HTTP 429 responses.
-        :param int http_429_cool_off_time_in_minutes: Minutes to sleep if an HTTP 429 is detected.
-        :param float http_429_cool_off_factor: Factor to multiply by http_429_cool_off_time_in_minutes for each HTTP 429
-            detected.
+        :param int http_429_max_retries: Max number of times to retry a request after an HTTP 429 is detected.  Once
+            exhausted, "HTTP_429_DETECTED" is added to the returned list.
+        :param float http_429_backoff_base_delay_in_seconds: Seconds to sleep after the first HTTP 429 is detected.  The
+            delay doubles for each subsequent HTTP 429 for the same request.
+        :param float http_429_backoff_max_delay_in_seconds: Cap on the exponential HTTP 429 delay.  A larger
+            Retry-After response header value sent by Google is always honored.
+        :param float http_429_backoff_jitter: Randomizes the HTTP 429 delay by +/- this fraction to make it look more
+            human.
+        :param int http_429_cool_off_time_in_minutes: Deprecated and ignored, use the http_429_backoff_* parameters.
+        :param float http_429_cool_off_factor: Deprecated and ignored, use the http_429_backoff_* parameters.
         :param str proxy: HTTP(S) or SOCKS5 proxy to use.
         :param bool verify_ssl: Verify the SSL certificate to prevent traffic interception attacks.  Defaults to True.
             This may need to be disabled in some HTTPS proxy instances.
@@ -141,14 +506,10 @@ class SearchClient:
         :return: List of URLs found or list of {"rank", "title", "description", "url"}
         """
 
-        self.query = urllib.parse.quote_plus(query)
+        self.query = query
         self.tld = tld
         self.lang_html_ui = lang_html_ui
-        self.lang_result = (
-            lang_result.lower()
-            if "-" not in lang_result
-            else f"{lang_result.split('-')[0].lower()}-{lang_result.split('-')[1].upper()}"
-        )
+        self.lang_result = _normalize_lang_result(lang_result)
         self.tbs = tbs
         self.safe = safe
         self.start = start
@@ -159,6 +520,10 @@ class SearchClient:
         self.minimum_delay_between_paged_results_in_seconds = minimum_delay_between_paged_results_in_seconds
         self.user_agent = user_agent
         self.yagooglesearch_manages_http_429s = yagooglesearch_manages_http_429s
+        self.http_429_max_retries = http_429_max_retries
+        self.http_429_backoff_base_delay_in_seconds = http_429_backoff_base_delay_in_seconds
+        self.http_429_backoff_max_delay_in_seconds = http_429_backoff_max_delay_in_seconds
+        self.http_429_backoff_jitter = http_429_backoff_jitter
         self.http_429_cool_off_time_in_minutes = http_429_cool_off_time_in_minutes
         self.http_429_cool_off_factor = http_429_cool_off_factor
         self.proxy = proxy
@@ -167,17 +532,26 @@ class SearchClient:
         self.verbose_output = verbose_output
         self.google_exemption = google_exemption
 
-        # Assign log level.
+        # Setup the default logging handlers, unless the calling script already did, and assign log level.
+        setup_logging()
         ROOT_LOGGER.setLevel((6 - self.verbosity) * 10)
 
         # Argument checks.
-        if self.lang_result not in result_languages_list:
+        if self.lang_result not in result_languages_set:
             ROOT_LOGGER.error(
-                f"{self.lang_result} is not a valid language result.  See {result_languages_file} for the list of valid "
-                'languages.  Setting lang_result to "lang_en".'
+                "%s is not a valid language result.  See %s for the list of valid languages.  Setting lang_result to "
+                '"lang_en".',
+                self.lang_result,
+                result_languages_file,
             )
             self.lang_result = "lang_en"
 
+        if self.http_429_cool_off_time_in_minutes is not None or self.http_429_cool_off_factor is not None:
+            ROOT_LOGGER.warning(
+                "http_429_cool_off_time_in_minutes and http_429_cool_off_factor are deprecated and ignored.  Use the "
+                "http_429_max_retries and http_429_backoff_* parameters instead."
+            )
+
         if self.num > 100:
             ROOT_LOGGER.warning("The largest value allowed by Google for num is 100.  Setting num to 100.")
             self.num = 100
@@ -187,14 +561,11 @@ class SearchClient:
                 "yagooglesearch is usually only able to retrieve a maximum of ~400 results.  See README for more details."
             )
 
-        # Populate cookies with GOOGLE_ABUSE_EXEMPTION if it is provided.  Otherwise, initialize cookies to None.
-        # It will be updated with each request in get_page().
-        if self.google_exemption:
-            self.cookies = {
-                "GOOGLE_ABUSE_EXEMPTION": self.google_exemption,
-            }
-        else:
-            self.cookies = None
+        # HTTP session reused for every request, which also manages the cookies.
+        self.session = self.create_session()
+
+        # Set once the Google consent cookie has been updated in get_page().
+        self._consent_fixed = False
 
         # Used later to ensure there are not any URL parameter collisions.
         self.url_parameters = (
@@ -209,6 +580,10 @@ class SearchClient:
             "lr",
         )
 
+        # Per-instance random number generator, so SearchClient objects in different threads don't contend for the
+        # random module's shared global state.
+        self._rng = random.Random()
+
         # Default user agent, unless instructed by the user to change it.
         if not user_agent:
             self.user_agent = self.assign_random_user_agent()
@@ -230,39 +605,113 @@ class SearchClient:
         if not self.verify_ssl:
             requests.packages.urllib3.disable_warnings(requests.packages.urllib3.exceptions.InsecureRequestWarning)
 
+    def create_session(self):
+        """Create the HTTP session used for all requests.  Reusing the session keeps the TCP and TLS connection to
+        Google alive across the home page and paged search results requests.
+
+        :rtype: requests.Session
+        :return: HTTP session.
+        """
+
+        # Let urllib3 retry transient 5xx server errors on the pooled connection.  HTTP 429s are not retried here
+        # because get_page() handles them itself: it applies jitter, can return "HTTP_429_DETECTED" to the calling
+        # script, and honors yagooglesearch_manages_http_429s.  respect_retry_after_header=False is required for that,
+        # otherwise urllib3 also retries any HTTP 429 carrying a Retry-After header.  raise_on_status=False hands the
+        # last 5xx response back to get_page() once the retries are exhausted.
+        retry = Retry(
+            total=3,
+            backoff_factor=self.http_429_backoff_base_delay_in_seconds,
+            status_forcelist=(500, 502, 503, 504),
+            respect_retry_after_header=False,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=10, max_retries=retry)
+
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        # Populate cookies with GOOGLE_ABUSE_EXEMPTION if it is provided.  The session updates the cookies with each
+        # request in get_page().
+        if self.google_exemption:
+            session.cookies.set("GOOGLE_ABUSE_EXEMPTION", self.google_exemption)
+
+        return session
+
+    def close(self):
+        """Close the HTTP session and its pooled connections."""
+
+        if self.session is not None:
+            self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def update_urls(self):
-        """Update search URLs being used."""
+        """Update the search URL parameters being used from the SearchClient attributes."""
+
+        # If no extra_params is given, create an empty dictionary. We should avoid using an empty dictionary as a
+        # default value in a function parameter in Python.
+        if not self.extra_params:
+            self.extra_params = {}
+
+        # Check extra_params for overlapping parameters.
+        for builtin_param in self.url_parameters:
+            if builtin_param in self.extra_params.keys():
+                raise ValueError(f'GET parameter "{builtin_param}" is overlapping with the built-in GET parameter')
 
         # URL templates to make Google searches.
         self.url_home = f"https://www.google.{self.tld}/"
 
-        # First search requesting the default 10 search results.
-        self.url_search = (
-            f"https://www.google.{self.tld}/search?hl={self.lang_html_ui}&lr={self.lang_result}&"
-            f"q={self.query}&btnG=Google+Search&tbs={self.tbs}&safe={self.safe}&"
-            f"cr={self.country}&filter=0"
-        )
+        # GET parameters common to every search request.
+        base_params = {
+            "hl": self.lang_html_ui,
+            "lr": self.lang_result,
+            "q": self.query,
+            "tbs": self.tbs,
+            "safe": self.safe,
+            "cr": self.country,
+            "filter": "0",
+        }
 
-        # Subsequent searches starting at &start= and retrieving 10 search results at a time.
-        self.url_next_page = (
-            f"https://www.google.{self.tld}/search?hl={self.lang_html_ui}&lr={self.lang_result}&"
-            f"q={self.query}&start={self.start}&tbs={self.tbs}&safe={self.safe}&"
-            f"cr={self.country}&filter=0"
-        )
+        # An extra "filter" parameter replaces the default one.
+        for key in self.extra_params:
+            base_params.pop(key, None)
 
-        # First search requesting more than the default 10 search results.
-        self.url_search_num = (
-            f"https://www.google.{self.tld}/search?hl={self.lang_html_ui}&lr={self.lang_result}&"
-            f"q={self.query}&num={self.num}&btnG=Google+Search&tbs={self.tbs}&"
-            f"safe={self.safe}&cr={self.country}&filter=0"
-        )
+        # Only &start=, &num=, and &btnG= vary between search requests, so URL encode everything else once here instead
+        # of for every page.  These are used by _build_url().
+        self._search_url_prefix = f"https://www.google.{self.tld}/search?{urllib.parse.urlencode(base_params)}"
 
-        # Subsequent searches starting at &start= and retrieving &num= search results at a time.
-        self.url_next_page_num = (
-            f"https://www.google.{self.tld}/search?hl={self.lang_html_ui}&lr={self.lang_result}&"
-            f"q={self.query}&start={self.start}&num={self.num}&tbs={self.tbs}&"
-            f"safe={self.safe}&cr={self.country}&filter=0"
-        )
+        self._extra_params_query_string = ""
+        if self.extra_params:
+            self._extra_params_query_string = f"&{urllib.parse.urlencode(self.extra_params, doseq=True)}"
+
+    def _build_url(self, *, include_num, include_start, include_btng):
+        """Build a Google search URL from the pre-encoded base GET parameters.
+
+        :param bool include_num: Request &num= search results instead of the default 10.
+        :param bool include_start: Start at the &start= search result, used for subsequent pages.
+        :param bool include_btng: Add &btnG=Google+Search, used for the first search request.
+
+        :rtype: str
+        :return: URL encoded Google search URL.
+        """
+
+        url = self._search_url_prefix
+
+        if include_start:
+            url += f"&start={self.start}"
+
+        if include_num:
+            url += f"&num={self.num}"
+
+        if include_btng:
+            url += "&btnG=Google+Search"
+
+        return url + self._extra_params_query_string
 
     def assign_random_user_agent(self):
         """Assign a random user agent string.
@@ -271,7 +720,8 @@ class SearchClient:
         :return: Random user agent string.
         """
 
-        random_user_agent = random.choice(user_agents_list)
+        # Honor a user_agents_list module attribute modified or assigned by the calling script.
+        random_user_agent = self._rng.choice(globals().get("user_agents_list") or get_user_agents())
         self.user_agent = random_user_agent
 
         return random_user_agent
@@ -285,55 +735,188 @@ class SearchClient:
         :return: URL string
         """
 
-        ROOT_LOGGER.debug(f"pre filter_search_result_urls() link: {link}")
+        # Called for every anchor on a page, so check the log level once instead of dispatching debug() calls that are
+        # filtered out anyway.
+        debug_enabled = ROOT_LOGGER.isEnabledFor(logging.DEBUG)
+
+        if debug_enabled:
+            ROOT_LOGGER.debug("pre filter_search_result_urls() link: %s", link)
+
+        # Navigation, tools, and other Google internal links never yield a valid result.
+        if not link or link.startswith(INTERNAL_LINK_PREFIXES):
+            if debug_enabled:
+                ROOT_LOGGER.debug("Excluding internal Google link: %s", link)
+            return None
 
         try:
             # Extract URL from parameter.  Once in a while the full "http://www.google.com/url?" exists instead of just
             # "/url?".  After a re-run, it disappears and "/url?" is present...might be a caching thing?
-            if link.startswith("/url?") or link.startswith("http://www.google.com/url?"):
-                urlparse_object = urllib.parse.urlparse(link, scheme="http")
+            if link.startswith(("/url?", "http://www.google.com/url?")):
+                # Only the query string is needed, so skip a full urllib.parse.urlparse() of the redirect URL.  Like
+                # urlparse().query, drop the redirect URL's #fragment.
+                query_params = urllib.parse.parse_qs(link.split("?", 1)[1].partition("#")[0])
 
-                # The "q" key exists most of the time.
-                try:
-                    link = urllib.parse.parse_qs(urlparse_object.query)["q"][0]
-                # Sometimes, only the "url" key does though.
-                except KeyError:
-                    link = urllib.parse.parse_qs(urlparse_object.query)["url"][0]
+                # The "q" key exists most of the time.  Sometimes, only the "url" key does though.
+                link = (query_params.get("q") or query_params["url"])[0]
+
+            netloc = _extract_netloc(link)
 
-            # Create a urlparse object.
-            urlparse_object = urllib.parse.urlparse(link, scheme="http")
+            # Only fall back to a full urllib.parse.urlparse() for scheme-relative URLs, e.g. "//example.com/".
+            if not netloc and link.startswith("//"):
+                netloc = urllib.parse.urlparse(link, scheme="http").netloc.lower()
 
             # Exclude urlparse objects without a netloc value.
-            if not urlparse_object.netloc:
-                ROOT_LOGGER.debug(
-                    f"Excluding URL because it does not contain a urllib.parse.urlparse netloc value: {link}"
-                )
+            if not netloc:
+                if debug_enabled:
+                    ROOT_LOGGER.debug(
+                        "Excluding URL because it does not contain a urllib.parse.urlparse netloc value: %s", link
+                    )
                 link = None
 
             # TODO: Generates false positives if specifying an actual Google site, e.g. "site:google.com fiber".
-            if urlparse_object.netloc and ("google" in urlparse_object.netloc.lower()):
-                ROOT_LOGGER.debug(f'Excluding URL because it contains "google": {link}')
+            elif any(substring in netloc for substring in GOOGLE_NETLOC_SUBSTRINGS):
+                if debug_enabled:
+                    ROOT_LOGGER.debug('Excluding URL because it contains "google": %s', link)
                 link = None
 
         except Exception:
             link = None
 
-        ROOT_LOGGER.debug(f"post filter_search_result_urls() link: {link}")
+        if debug_enabled:
+            ROOT_LOGGER.debug("post filter_search_result_urls() link: %s", link)
 
         return link
 
-    def http_429_detected(self):
-        """Increase the HTTP 429 cool off period."""
+    def _compute_backoff(self, attempt):
+        """Calculate the exponential backoff delay, with jitter, for the given HTTP 429 retry attempt.
+
+        :param int attempt: Zero-based retry attempt.
+
+        :rtype: float
+        :return: Seconds to sleep.
+        """
 
-        new_http_429_cool_off_time_in_minutes = round(
-            self.http_429_cool_off_time_in_minutes * self.http_429_cool_off_factor,
-            2,
+        delay = min(
+            self.http_429_backoff_max_delay_in_seconds,
+            self.http_429_backoff_base_delay_in_seconds * 2**attempt,
         )
+
+        return delay * self._rng.uniform(1 - self.http_429_backoff_jitter, 1 + self.http_429_backoff_jitter)
+
+    def http_429_detected(self, retry_after, attempt):
+        """Determine the HTTP 429 cool off period.  Google's Retry-After response header is used if it asks for a longer
+        delay than the exponential backoff, up to RETRY_AFTER_MAX_DELAY_IN_SECONDS.
+
+        :param str retry_after: Retry-After HTTP response header value, if any.
+        :param int attempt: Zero-based retry attempt.
+
+        :rtype: float
+        :return: Seconds to sleep before retrying the request.
+        """
+
+        delay = self._compute_backoff(attempt)
+
+        retry_after_delay = _parse_retry_after(retry_after)
+        if retry_after_delay is not None and retry_after_delay > delay:
+            ROOT_LOGGER.info("Honoring Retry-After response header: %s", retry_after)
+            delay = retry_after_delay
+
         ROOT_LOGGER.info(
-            f"Increasing HTTP 429 cool off time by a factor of {self.http_429_cool_off_factor}, "
-            f"from {self.http_429_cool_off_time_in_minutes} minutes to {new_http_429_cool_off_time_in_minutes} minutes"
+            "HTTP 429 retry %s / %s, sleeping for %.2f seconds...", attempt + 1, self.http_429_max_retries, delay
         )
-        self.http_429_cool_off_time_in_minutes = new_http_429_cool_off_time_in_minutes
+
+        return delay
+
+    def html_too_large(self, size, url):
+        """Check a response body size against MAX_HTML_BYTES.  Shared by SearchClient and AsyncSearchClient.
+
+        :param int size: Content-Length of the response or number of bytes read so far, None if unknown.
+        :param str url: URL retrieved.
+
+        :rtype: bool
+        :return: True if the response is larger than MAX_HTML_BYTES and should be skipped.
+        """
+
+        if size is None or size <= MAX_HTML_BYTES:
+            return False
+
+        ROOT_LOGGER.warning("Response is larger than MAX_HTML_BYTES (%s bytes), skipping it: %s", MAX_HTML_BYTES, url)
+
+        return True
+
+    def get_consent_cookie(self, consent_cookie):
+        """Google throws up a consent page for searches sourcing from a European Union country IP location.  Build the
+        CONSENT cookie accepting it from the one Google sets.  See https://github.com/benbusby/whoogle-search/issues/311
+        Once the cookie has been updated, there is no need to check the following responses.
+
+        :param str consent_cookie: CONSENT response cookie value, if any.
+
+        :rtype: str
+        :return: Updated CONSENT cookie value, or None if the cookie doesn't need to be updated.
+        """
+
+        if self._consent_fixed or not consent_cookie or not consent_cookie.startswith("PENDING+"):
+            return None
+
+        ROOT_LOGGER.warning(
+            "Looks like your IP address is sourcing from a European Union location...your search results may vary, but "
+            "I'll try and work around this by updating the cookie."
+        )
+
+        # Pull out the random number assigned to the response cookie.
+        number = consent_cookie.split("+")[1]
+
+        # See https://github.com/benbusby/whoogle-search/pull/320/files
+        """
+        Attempting to dissect/breakdown the new cookie response values.
+
+        YES - Accept consent
+        shp - ?
+        gws - "server:" header value returned from original request.  Maybe Google Workspace plus a build?
+        fr - Original tests sourced from France.  Assuming this is the country code.  Country code was changed to .de
+            and it still worked.
+        F - FX agrees to tracking. Modifying it to just F seems to consent with "no" to personalized stuff.  Not tested,
+            solely based off of
+            https://github.com/benbusby/whoogle-search/issues/311#issuecomment-841065630
+        XYZ - Random 3-digit number assigned to the first response cookie.
+        """
+        self._consent_fixed = True
+
+        return f"YES+shp.gws-20211108-0-RC1.fr+F+{number}"
+
+    def handle_http_response_code(self, http_response_code, retry_after, attempt):
+        """Decide what get_page() does with a non-HTTP 200 response.  Shared by SearchClient and AsyncSearchClient so
+        both handle HTTP 429s the same way.
+
+        :param int http_response_code: HTTP response status code.
+        :param str retry_after: Retry-After HTTP response header value, if any.
+        :param int attempt: Zero-based retry attempt.
+
+        :rtype: tuple
+        :return: (page, delay).  If page is not None, get_page() returns it.  Otherwise get_page() sleeps for delay
+            seconds and retries the request.
+        """
+
+        if http_response_code != 429:
+            ROOT_LOGGER.warning("HTML response code: %s", http_response_code)
+            return "", None
+
+        ROOT_LOGGER.warning("Google is blocking your IP for making too many requests in a specific time period.")
+
+        # Calling script does not want yagooglesearch to handle HTTP 429 cool off and retry.  Just return a notification
+        # string.
+        if not self.yagooglesearch_manages_http_429s:
+            ROOT_LOGGER.info("Since yagooglesearch_manages_http_429s=False, yagooglesearch is done.")
+            return "HTTP_429_DETECTED", None
+
+        if attempt >= self.http_429_max_retries:
+            ROOT_LOGGER.error(
+                "Still receiving HTTP 429 responses after %s retries, giving up.", self.http_429_max_retries
+            )
+            return "HTTP_429_DETECTED", None
+
+        # Try making the request again after cooling off.
+        return None, self.http_429_detected(retry_after, attempt)
 
     def get_page(self, url):
         """Request the given URL and return the response page.
@@ -348,91 +931,371 @@ class SearchClient:
             "User-Agent": self.user_agent,
         }
 
-        ROOT_LOGGER.info(f"Requesting URL: {url}")
-        response = requests.get(
-            url,
-            proxies=self.proxy_dict,
-            headers=headers,
-            cookies=self.cookies,
-            timeout=15,
-            verify=self.verify_ssl,
+        # handle_http_response_code() returns a page once the HTTP 429 retries are exhausted.
+        for attempt in itertools.count():
+            get_token_bucket(self.tld, self.proxy).acquire()
+
+            ROOT_LOGGER.info("Requesting URL: %s", url)
+            # proxies and verify are passed on every request, instead of being set on the session, so they can be
+            # tuned after the SearchClient object is instantiated.
+            response = self.session.get(
+                url,
+                proxies=self.proxy_dict,
+                headers=headers,
+                timeout=15,
+                verify=self.verify_ssl,
+                stream=True,
+            )
+
+            # The response body is only downloaded and decoded for HTTP 200 responses.  Leaving the "with" block
+            # releases the connection.
+            with response:
+                # Extract the HTTP response code.
+                http_response_code = response.status_code
+
+                # debug_requests_response(response)
+                if ROOT_LOGGER.isEnabledFor(logging.DEBUG):
+                    ROOT_LOGGER.debug("    status_code: %s", http_response_code)
+                    ROOT_LOGGER.debug("    headers: %s", headers)
+                    ROOT_LOGGER.debug("    cookies: %s", self.session.cookies)
+                    ROOT_LOGGER.debug("    proxy: %s", self.proxy)
+                    ROOT_LOGGER.debug("    verify_ssl: %s", self.verify_ssl)
+
+                # Google throws up a consent page for searches sourcing from a European Union country IP location.
+                consent_cookie = self.get_consent_cookie(response.cookies.get("CONSENT"))
+                if consent_cookie:
+                    self.session.cookies.clear()
+                    self.session.cookies.set("CONSENT", consent_cookie)
+
+                    ROOT_LOGGER.info("Updating cookie to: %s", self.session.cookies)
+
+                if http_response_code == 200:
+                    if self.html_too_large(_parse_content_length(response.headers.get("Content-Length")), url):
+                        return ""
+
+                    # Read the body in chunks to bound memory when there is no Content-Length, e.g. chunked responses.
+                    body = bytearray()
+                    for chunk in response.iter_content(chunk_size=HTML_READ_CHUNK_BYTES):
+                        body += chunk
+                        if self.html_too_large(len(body), url):
+                            return ""
+
+                    # requests only sets response.encoding from an explicit charset for text/* responses, and defaults
+                    # it to ISO-8859-1 otherwise.
+                    charset = None
+                    if "charset=" in response.headers.get("Content-Type", "").lower():
+                        charset = response.encoding
+
+                    return _decode_html(bytes(body), charset)
+
+                retry_after = response.headers.get("Retry-After")
+
+            page, delay = self.handle_http_response_code(http_response_code, retry_after, attempt)
+            if page is not None:
+                return page
+
+            # The HTTP 429 response was already released when exiting the "with" block above, so at most one response
+            # is held in memory no matter how many retries are needed.
+            time.sleep(delay)
+
+    def prepare_search(self):
+        """Reset the search results and counters before starting a new search."""
+
+        # Consolidate search results.
+        self.search_result_list = []
+
+        # URLs already found, for O(1) duplicate checks.  search_result_list can't be used since it holds dicts when
+        # verbose_output is True.
+        self._seen_links = set()
+
+        # Count the number of valid, non-duplicate links found.
+        self.total_valid_links_found = 0
+
+    def get_search_url(self):
+        """Build the URL for the next page of search results.
+
+        :rtype: str
+        :return: Google search URL for the current start and num attributes.
+        """
+
+        ROOT_LOGGER.info(
+            "Stats: start=%s, num=%s, total_valid_links_found=%s / max_search_result_urls_to_return=%s",
+            self.start,
+            self.num,
+            self.total_valid_links_found,
+            self.max_search_result_urls_to_return,
+        )
+
+        # The first search request includes &btnG=, subsequent pages include &start=.  &num= is only needed when
+        # requesting more than the default 10 search results.
+        return self._build_url(
+            include_num=self.num != 10,
+            include_start=bool(self.start),
+            include_btng=not self.start,
         )
 
-        # Update the cookies.
-        self.cookies = response.cookies
+    def extract_search_results_lxml(self, html):
+        """Extract the valid search result URLs with a single lxml XPath query, without creating Python objects for
+        every HTML element.  Used when verbose_output is False.
 
-        # Extract the HTTP response code.
-        http_response_code = response.status_code
+        :param str html: Web page HTML retrieved for a Google search URL.
 
-        # debug_requests_response(response)
-        ROOT_LOGGER.debug(f"    status_code: {http_response_code}")
-        ROOT_LOGGER.debug(f"    headers: {headers}")
-        ROOT_LOGGER.debug(f"    cookies: {self.cookies}")
-        ROOT_LOGGER.debug(f"    proxy: {self.proxy}")
-        ROOT_LOGGER.debug(f"    verify_ssl: {self.verify_ssl}")
+        :rtype: generator
+        :return: (url, title, description) tuples, where title and description are always None.
+        """
 
-        # Google throws up a consent page for searches sourcing from a European Union country IP location.
-        # See https://github.com/benbusby/whoogle-search/issues/311
         try:
-            if response.cookies["CONSENT"].startswith("PENDING+"):
-                ROOT_LOGGER.warning(
-                    "Looks like your IP address is sourcing from a European Union location...your search results may "
-                    "vary, but I'll try and work around this by updating the cookie."
-                )
+            try:
+                tree = lxml.html.fromstring(html)
+            # lxml refuses str input starting with an XML declaration that declares an encoding, e.g. an XHTML page from
+            # a proxy or captive portal.  The page is already decoded, so parse it as UTF-8 bytes instead.
+            except ValueError:
+                tree = lxml.html.fromstring(html.encode("utf-8"), parser=lxml.html.HTMLParser(encoding="utf-8"))
+        # Empty page, e.g. a non-HTTP 200 response.
+        except lxml.etree.ParserError:
+            return
+
+        # smart_strings=False returns plain str hrefs.  lxml's default "smart strings" keep a reference to their
+        # element, which would keep the page's whole tree alive for as long as the search results are.
+        search = tree.xpath('//*[@id="search"]')
+        if search:
+            hrefs = search[0].xpath(".//a/@href", smart_strings=False)
+        # Sometimes (depending on the User-Agent) there is no id "search" in html response.  Fall back to all the links
+        # on the page, except those in the top bar.  An id "search" container without links, e.g. past the last page of
+        # results, yields nothing.
+        else:
+            hrefs = tree.xpath('//a[not(ancestor::*[@id="gbar"])]/@href', smart_strings=False)
+
+        for href in hrefs:
+            # Filter invalid links and links pointing to Google itself.
+            link = self.filter_search_result_urls(href)
+            if link:
+                yield link, None, None
+
+    def extract_search_results_selectolax(self, html):
+        """Extract the valid search results from the id "search" container using selectolax.
+
+        :param str html: Web page HTML retrieved for a Google search URL.
+
+        :rtype: generator
+        :return: (url, title, description) tuples.
+        """
 
-                # Convert the cookiejar data structure to a Python dict.
-                cookie_dict = requests.utils.dict_from_cookiejar(self.cookies)
+        search = LexborHTMLParser(html).css_first("#search")
+        if search is None:
+            return
 
-                # Pull out the random number assigned to the response cookie.
-                number = cookie_dict["CONSENT"].split("+")[1]
+        for node in search.css("a[href]"):
+            # Filter invalid links and links pointing to Google itself.
+            link = self.filter_search_result_urls(node.attributes.get("href"))
+            if not link:
+                continue
 
-                # See https://github.com/benbusby/whoogle-search/pull/320/files
-                """
-                Attempting to dissect/breakdown the new cookie response values.
+            # Extract the URL title.
+            try:
+                title = node.text()
+            except Exception:
+                ROOT_LOGGER.warning("No title for link: %s", link)
+                title = ""
+
+            # Extract the URL description.
+            try:
+                contents = list(node.parent.parent.iter(include_text=True))
+                description = contents[1].text()
 
-                YES - Accept consent
-                shp - ?
-                gws - "server:" header value returned from original request.  Maybe Google Workspace plus a build?
-                fr - Original tests sourced from France.  Assuming this is the country code.  Country code was changed
-                    to .de and it still worked.
-                F - FX agrees to tracking. Modifying it to just F seems to consent with "no" to personalized stuff.
-                    Not tested, solely based off of
-                    https://github.com/benbusby/whoogle-search/issues/311#issuecomment-841065630
-                XYZ - Random 3-digit number assigned to the first response cookie.
-                """
-                self.cookies = {"CONSENT": f"YES+shp.gws-20211108-0-RC1.fr+F+{number}"}
+                # Sometimes Google returns different structures.
+                if description == "":
+                    description = contents[2].text()
 
-                ROOT_LOGGER.info(f"Updating cookie to: {self.cookies}")
+            except Exception:
+                ROOT_LOGGER.warning("No description for link: %s", link)
+                description = ""
 
-        # "CONSENT" cookie does not exist.
-        except KeyError:
-            pass
+            yield link, title, description
 
-        html = ""
+    def extract_search_results_bs4(self, html):
+        """Extract the valid search results using BeautifulSoup.
 
-        if http_response_code == 200:
-            html = response.text
+        :param str html: Web page HTML retrieved for a Google search URL.
 
-        elif http_response_code == 429:
-            ROOT_LOGGER.warning("Google is blocking your IP for making too many requests in a specific time period.")
+        :rtype: generator
+        :return: (url, title, description) tuples, where title and description are None if verbose_output is False.
+        """
 
-            # Calling script does not want yagooglesearch to handle HTTP 429 cool off and retry.  Just return a
-            # notification string.
-            if not self.yagooglesearch_manages_http_429s:
-                ROOT_LOGGER.info("Since yagooglesearch_manages_http_429s=False, yagooglesearch is done.")
-                return "HTTP_429_DETECTED"
+        # Create the BeautifulSoup object, discarding everything outside of the id "search" container while parsing.
+        soup = BeautifulSoup(html, BS4_PARSER, parse_only=SEARCH_STRAINER)
 
-            ROOT_LOGGER.info(f"Sleeping for {self.http_429_cool_off_time_in_minutes} minutes...")
-            time.sleep(self.http_429_cool_off_time_in_minutes * 60)
-            self.http_429_detected()
+        # Find all HTML <a> elements.
+        try:
+            anchors = soup.find(id="search").find_all("a")
+        # Sometimes (depending on the User-Agent) there is no id "search" in html response.
+        except AttributeError:
+            # Parse the whole page instead.
+            soup = BeautifulSoup(html, BS4_PARSER)
+
+            # Remove links from the top bar.
+            gbar = soup.find(id="gbar")
+            if gbar:
+                gbar.clear()
+            anchors = soup.find_all("a")
+
+        # Process every anchored URL.
+        for a in anchors:
+            # Get the URL from the anchor tag.
+            try:
+                link = a["href"]
+            except KeyError:
+                ROOT_LOGGER.warning("No href for link: %s", a)
+                continue
 
-            # Try making the request again.
-            html = self.get_page(url)
+            # Filter invalid links and links pointing to Google itself.
+            link = self.filter_search_result_urls(link)
+            if not link:
+                continue
+
+            title = None
+            description = None
+
+            if self.verbose_output:
+                # Extract the URL title.
+                try:
+                    title = a.get_text()
+                except Exception:
+                    ROOT_LOGGER.warning("No title for link: %s", link)
+                    title = ""
+
+                # Extract the URL description.
+                try:
+                    description = a.parent.parent.contents[1].get_text()
+
+                    # Sometimes Google returns different structures.
+                    if description == "":
+                        description = a.parent.parent.contents[2].get_text()
+
+                except Exception:
+                    ROOT_LOGGER.warning("No description for link: %s", link)
+                    description = ""
+
+            yield link, title, description
+
+    def parse_search_results(self, html):
+        """Extract the valid search result URLs from a Google search results page and add them to
+        self.search_result_list.
+
+        :param str html: Web page HTML retrieved for a Google search URL.
+
+        :rtype: bool
+        :return: True if the search is complete, either because max_search_result_urls_to_return was reached or no
+            valid search results were found on this page.  False if the next page should be retrieved.
+        """
+
+        # Parsing the HTML is the most CPU intensive part of a search, so extract the URLs with lxml's C-based XPath
+        # when only URLs are needed.  Prefer selectolax's much faster C-based parser for verbose output.  BeautifulSoup
+        # handles the remaining cases.
+        search_results = None
+        if not self.verbose_output:
+            if lxml is not None:
+                search_results = self.extract_search_results_lxml(html)
+        elif LexborHTMLParser is not None and 'id="search"' in html:
+            search_results = self.extract_search_results_selectolax(html)
+
+        if search_results is None:
+            search_results = self.extract_search_results_bs4(html)
+
+        # Attribute lookups are hoisted into locals, and the verbose_output check is made once instead of for every
+        # link.
+        seen_links = self._seen_links
+        search_result_list = self.search_result_list
+        max_search_result_urls_to_return = self.max_search_result_urls_to_return
+        total_valid_links_found = self.total_valid_links_found
+
+        # Tracks number of valid URLs found on a search page.
+        valid_links_found_in_this_search = 0
+
+        if self.verbose_output:
+            for link, title, description in search_results:
+                # Check if URL has already been found.  set.add() is a no-op for duplicates, so comparing the set's size
+                # before and after hashes the link once instead of twice for an "in" check followed by an add().
+                seen_links_count = len(seen_links)
+                seen_links.add(link)
+                if len(seen_links) == seen_links_count:
+                    ROOT_LOGGER.info("Duplicate URL found: %s", link)
+                    continue
+
+                # Increase the counters.
+                valid_links_found_in_this_search += 1
+                total_valid_links_found += 1
+
+                ROOT_LOGGER.info("Found unique URL #%s: %s", total_valid_links_found, link)
+
+                search_result_list.append(
+                    {
+                        "rank": total_valid_links_found,  # Approximate rank according to yagooglesearch.
+                        "title": title.strip(),  # Remove leading and trailing spaces.
+                        "description": description.strip(),  # Remove leading and trailing spaces.
+                        "url": link,
+                    }
+                )
+
+                # If we reached the limit of requested URLs, stop processing this page.
+                if max_search_result_urls_to_return <= total_valid_links_found:
+                    break
 
         else:
-            ROOT_LOGGER.warning(f"HTML response code: {http_response_code}")
+            for link, _, _ in search_results:
+                # Check if URL has already been found.  set.add() is a no-op for duplicates, so comparing the set's size
+                # before and after hashes the link once instead of twice for an "in" check followed by an add().
+                seen_links_count = len(seen_links)
+                seen_links.add(link)
+                if len(seen_links) == seen_links_count:
+                    ROOT_LOGGER.info("Duplicate URL found: %s", link)
+                    continue
+
+                # Increase the counters.
+                valid_links_found_in_this_search += 1
+                total_valid_links_found += 1
+
+                ROOT_LOGGER.info("Found unique URL #%s: %s", total_valid_links_found, link)
+
+                search_result_list.append(link)
 
-        return html
+                # If we reached the limit of requested URLs, stop processing this page.
+                if max_search_result_urls_to_return <= total_valid_links_found:
+                    break
+
+        self.total_valid_links_found = total_valid_links_found
+
+        # If we reached the limit of requested URLs, return with the results.  total_valid_links_found always matches
+        # len(self.search_result_list) since both are reset in prepare_search().
+        if max_search_result_urls_to_return <= total_valid_links_found:
+            return True
+
+        # Determining if a "Next" URL page of results is not straightforward.  If no valid links are found, the
+        # search results have been exhausted.
+        if valid_links_found_in_this_search == 0:
+            ROOT_LOGGER.info("No valid search results found on this page.  Moving on...")
+            return True
+
+        # Bump the starting page URL parameter for the next request.  get_search_url() reads self.start directly, so the
+        # base URL parameters don't need to be refreshed.
+        self.start += self.num
+
+        return False
+
+    def get_random_sleep_time(self):
+        """Randomize sleep time between paged requests to make it look more human.
+
+        :rtype: int
+        :return: Seconds to sleep before retrieving the next page of results.
+        """
+
+        random_sleep_time = self._rng.randrange(
+            self.minimum_delay_between_paged_results_in_seconds,
+            self.minimum_delay_between_paged_results_in_seconds + 11,
+        )
+        ROOT_LOGGER.info("Sleeping %s seconds until retrieving the next page of results...", random_sleep_time)
+
+        return random_sleep_time
 
     def search(self):
         """Start the Google search.
@@ -441,52 +1304,16 @@ class SearchClient:
         :return: List of URLs found or list of {"rank", "title", "description", "url"}
         """
 
-        # Consolidate search results.
-        self.search_result_list = []
-
-        # Count the number of valid, non-duplicate links found.
-        total_valid_links_found = 0
-
-        # If no extra_params is given, create an empty dictionary. We should avoid using an empty dictionary as a
-        # default value in a function parameter in Python.
-        if not self.extra_params:
-            self.extra_params = {}
-
-        # Check extra_params for overlapping parameters.
-        for builtin_param in self.url_parameters:
-            if builtin_param in self.extra_params.keys():
-                raise ValueError(f'GET parameter "{builtin_param}" is overlapping with the built-in GET parameter')
+        self.prepare_search()
 
         # Simulates browsing to the https://www.google.com home page and retrieving the initial cookie.
         html = self.get_page(self.url_home)
 
         # Loop until we reach the maximum result results found or there are no more search results found to reach
         # max_search_result_urls_to_return.
-        while total_valid_links_found <= self.max_search_result_urls_to_return:
-            ROOT_LOGGER.info(
-                f"Stats: start={self.start}, num={self.num}, total_valid_links_found={total_valid_links_found} / "
-                f"max_search_result_urls_to_return={self.max_search_result_urls_to_return}"
-            )
-
-            # Prepare the URL for the search request.
-            if self.start:
-                if self.num == 10:
-                    url = self.url_next_page
-                else:
-                    url = self.url_next_page_num
-            else:
-                if self.num == 10:
-                    url = self.url_search
-                else:
-                    url = self.url_search_num
-
-            # Append extra GET parameters to the URL.  This is done on every iteration because we're rebuilding the
-            # entire URL at the end of this loop.  The keys and values are not URL encoded.
-            for key, value in self.extra_params.items():
-                url += f"&{key}={value}"
-
+        while self.total_valid_links_found <= self.max_search_result_urls_to_return:
             # Request Google search results.
-            html = self.get_page(url)
+            html = self.get_page(self.get_search_url())
 
             # HTTP 429 message returned from get_page() function, add "HTTP_429_DETECTED" to the set and return to the
             # calling script.
@@ -494,109 +1321,221 @@ class SearchClient:
                 self.search_result_list.append("HTTP_429_DETECTED")
                 return self.search_result_list
 
-            # Create the BeautifulSoup object.
-            soup = BeautifulSoup(html, "html.parser")
+            if self.parse_search_results(html):
+                return self.search_result_list
+
+            time.sleep(self.get_random_sleep_time())
 
-            # Find all HTML <a> elements.
+        return self.search_result_list
+
+
+class AsyncSearchClient(SearchClient):
+    def __init__(self, *args, **kwargs):
+        """
+        AsyncSearchClient
+        Same parameters as SearchClient, but get_page() and search() are coroutines built on aiohttp so that multiple
+        searches can be run concurrently with asyncio.gather().  Concurrent HTTP requests across all AsyncSearchClient
+        objects on the same event loop are capped by ASYNC_SEMAPHORE_LIMIT.  Note that aiohttp only supports HTTP
+        proxies, not SOCKS5.
+
+        :rtype: List of str
+        :return: List of URLs found or list of {"rank", "title", "description", "url"}
+        """
+
+        if aiohttp is None:
+            raise ImportError("AsyncSearchClient requires aiohttp.  Install it with: pip install yagooglesearch[async]")
+
+        # The aiohttp.CookieJar must be created within a running event loop.  It is kept for the life of the
+        # AsyncSearchClient object, while the aiohttp.ClientSession only lives for a single search.
+        self.cookie_jar = None
+
+        super().__init__(*args, **kwargs)
+
+    def create_session(self):
+        """The aiohttp.ClientSession must be created within a running event loop, so it is created by search() or
+        get_page() with create_client_session().
+
+        :rtype: None
+        :return: None
+        """
+
+        return None
+
+    def create_client_session(self):
+        """Create the aiohttp.ClientSession used for all requests of a search.  Must be called within a running event
+        loop.  The aiohttp.CookieJar is created the first time and reused by the following sessions.
+
+        :rtype: aiohttp.ClientSession
+        :return: HTTP session.
+        """
+
+        if self.cookie_jar is None:
+            self.cookie_jar = aiohttp.CookieJar()
+
+            # Populate cookies with GOOGLE_ABUSE_EXEMPTION if it is provided.
+            if self.google_exemption:
+                self.cookie_jar.update_cookies({"GOOGLE_ABUSE_EXEMPTION": self.google_exemption})
+
+        # Every request goes to www.google.{tld}, so cap the connections per host as well as in total.
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=ASYNC_SEMAPHORE_LIMIT, limit_per_host=ASYNC_SEMAPHORE_LIMIT, ssl=self.verify_ssl
+            ),
+            cookie_jar=self.cookie_jar,
+        )
+
+    async def get_page(self, url):
+        """Request the given URL and return the response page.  If it is called outside of search(), a session is
+        opened just for this request.
+
+        :param str url: URL to retrieve.
+
+        :rtype: str
+        :return: Web page HTML retrieved for the given URL
+        """
+
+        if self.session is not None:
+            return await self.request_page(url)
+
+        self.session = self.create_client_session()
+        try:
+            return await self.request_page(url)
+        finally:
+            await self.session.close()
+            self.session = None
+
+    async def request_page(self, url):
+        """Request the given URL with the open session and return the response page.
+
+        :param str url: URL to retrieve.
+
+        :rtype: str
+        :return: Web page HTML retrieved for the given URL
+        """
+
+        headers = {
+            "User-Agent": self.user_agent,
+        }
+
+        # handle_http_response_code() returns a page once the HTTP 429 retries are exhausted.
+        for attempt in itertools.count():
+            # Wait for the shared rate limiter without blocking the event loop or holding the semaphore.
+            delay = get_token_bucket(self.tld, self.proxy).reserve()
+            if delay:
+                ROOT_LOGGER.info("Client-side rate limit reached, sleeping for %.2f seconds...", delay)
+                await asyncio.sleep(delay)
+
+            ROOT_LOGGER.info("Requesting URL: %s", url)
             try:
-                anchors = soup.find(id="search").find_all("a")
-            # Sometimes (depending on the User-Agent) there is no id "search" in html response.
-            except AttributeError:
-                # Remove links from the top bar.
-                gbar = soup.find(id="gbar")
-                if gbar:
-                    gbar.clear()
-                anchors = soup.find_all("a")
-
-            # Tracks number of valid URLs found on a search page.
-            valid_links_found_in_this_search = 0
-
-            # Process every anchored URL.
-            for a in anchors:
-                # Get the URL from the anchor tag.
-                try:
-                    link = a["href"]
-                except KeyError:
-                    ROOT_LOGGER.warning(f"No href for link: {link}")
-                    continue
+                async with get_async_semaphore():
+                    async with self.session.get(
+                        url,
+                        proxy=self.proxy or None,
+                        headers=headers,
+                        timeout=aiohttp.ClientTimeout(total=15),
+                        ssl=self.verify_ssl,
+                    ) as response:
+                        # Extract the HTTP response code.
+                        http_response_code = response.status
+
+                        # filter_cookies() is evaluated eagerly, so only build the debug output when it is logged.
+                        if ROOT_LOGGER.isEnabledFor(logging.DEBUG):
+                            ROOT_LOGGER.debug("    status_code: %s", http_response_code)
+                            ROOT_LOGGER.debug("    headers: %s", headers)
+                            ROOT_LOGGER.debug("    cookies: %s", self.cookie_jar.filter_cookies(response.url))
+                            ROOT_LOGGER.debug("    proxy: %s", self.proxy)
+                            ROOT_LOGGER.debug("    verify_ssl: %s", self.verify_ssl)
+
+                        # Google throws up a consent page for searches sourcing from a European Union country IP
+                        # location.
+                        consent_morsel = response.cookies.get("CONSENT")
+                        consent_cookie = self.get_consent_cookie(consent_morsel.value if consent_morsel else None)
+                        if consent_cookie:
+                            self.cookie_jar.clear()
+                            self.cookie_jar.update_cookies({"CONSENT": consent_cookie})
+
+                            ROOT_LOGGER.info("Updating cookie to: %s", consent_cookie)
+
+                        html = ""
+                        retry_after = response.headers.get("Retry-After")
+
+                        if http_response_code == 200:
+                            content_length = _parse_content_length(response.headers.get("Content-Length"))
+                            if self.html_too_large(content_length, url):
+                                return ""
+
+                            # Read at most MAX_HTML_BYTES + 1 bytes to bound memory when there is no Content-Length,
+                            # e.g. chunked responses.  StreamReader.read() returns up to the number of bytes requested.
+                            body = bytearray()
+                            while len(body) <= MAX_HTML_BYTES:
+                                chunk = await response.content.read(MAX_HTML_BYTES + 1 - len(body))
+                                if not chunk:
+                                    break
+                                body += chunk
+
+                            if self.html_too_large(len(body), url):
+                                return ""
+
+                            html = _decode_html(bytes(body), response.charset)
+            # aiohttp rejects malformed responses, e.g. an invalid Content-Length header, before returning them.  The
+            # synchronous SearchClient tolerates these, so skip the page instead of aborting the search.
+            except aiohttp.ClientResponseError as e:
+                ROOT_LOGGER.warning("Malformed HTTP response for URL %s: %s", url, e.message)
+                return ""
+
+            if http_response_code == 200:
+                return html
+
+            page, delay = self.handle_http_response_code(http_response_code, retry_after, attempt)
+            if page is not None:
+                return page
+
+            # The HTTP 429 response was already released when exiting the "async with" block above.
+            await asyncio.sleep(delay)
+
+    async def search(self):
+        """Start the Google search.
 
-                # Filter invalid links and links pointing to Google itself.
-                link = self.filter_search_result_urls(link)
-                if not link:
-                    continue
+        :rtype: List of str
+        :return: List of URLs found or list of {"rank", "title", "description", "url"}
+        """
+
+        self.prepare_search()
 
-                if self.verbose_output:
-                    # Extract the URL title.
-                    try:
-                        title = a.get_text()
-                    except Exception:
-                        ROOT_LOGGER.warning(f"No title for link: {link}")
-                        title = ""
-
-                    # Extract the URL description.
-                    try:
-                        description = a.parent.parent.contents[1].get_text()
-
-                        # Sometimes Google returns different structures.
-                        if description == "":
-                            description = a.parent.parent.contents[2].get_text()
-
-                    except Exception:
-                        ROOT_LOGGER.warning(f"No description for link: {link}")
-                        description = ""
-
-                # Check if URL has already been found.
-                if link not in self.search_result_list:
-                    # Increase the counters.
-                    valid_links_found_in_this_search += 1
-                    total_valid_links_found += 1
-
-                    ROOT_LOGGER.info(f"Found unique URL #{total_valid_links_found}: {link}")
-
-                    if self.verbose_output:
-                        self.search_result_list.append(
-                            {
-                                "rank": total_valid_links_found,  # Approximate rank according to yagooglesearch.
-                                "title": title.strip(),  # Remove leading and trailing spaces.
-                                "description": description.strip(),  # Remove leading and trailing spaces.
-                                "url": link,
-                            }
-                        )
-                    else:
-                        self.search_result_list.append(link)
-
-                else:
-                    ROOT_LOGGER.info(f"Duplicate URL found: {link}")
-
-                # If we reached the limit of requested URLs, return with the results.
-                if self.max_search_result_urls_to_return <= len(self.search_result_list):
+        self.session = self.create_client_session()
+
+        try:
+            # Simulates browsing to the https://www.google.com home page and retrieving the initial cookie.
+            html = await self.get_page(self.url_home)
+
+            # Loop until we reach the maximum result results found or there are no more search results found to reach
+            # max_search_result_urls_to_return.
+            while self.total_valid_links_found <= self.max_search_result_urls_to_return:
+                # Request Google search results.
+                html = await self.get_page(self.get_search_url())
+
+                # HTTP 429 message returned from get_page() function, add "HTTP_429_DETECTED" to the set and return to
+                # the calling script.
+                if html == "HTTP_429_DETECTED":
+                    self.search_result_list.append("HTTP_429_DETECTED")
                     return self.search_result_list
 
-            # Determining if a "Next" URL page of results is not straightforward.  If no valid links are found, the
-            # search results have been exhausted.
-            if valid_links_found_in_this_search == 0:
-                ROOT_LOGGER.info("No valid search results found on this page.  Moving on...")
-                return self.search_result_list
+                if self.parse_search_results(html):
+                    return self.search_result_list
 
-            # Bump the starting page URL parameter for the next request.
-            self.start += self.num
+                await asyncio.sleep(self.get_random_sleep_time())
 
-            # Refresh the URLs.
-            self.update_urls()
+        finally:
+            await self.session.close()
+            self.session = None
 
-            # If self.num == 10, this is the default search criteria.
-            if self.num == 10:
-                url = self.url_next_page
-            # User has specified search criteria requesting more than 10 results at a time.
-            else:
-                url = self.url_next_page_num
+        return self.search_result_list
 
-            # Randomize sleep time between paged requests to make it look more human.
-            random_sleep_time = random.choice(
-                range(
-                    self.minimum_delay_between_paged_results_in_seconds,
-                    self.minimum_delay_between_paged_results_in_seconds + 11,
-                )
-            )
-            ROOT_LOGGER.info(f"Sleeping {random_sleep_time} seconds until retrieving the next page of results...")
-            time.sleep(random_sleep_time)
+    def sync_search(self):
+        """Run the asynchronous Google search to completion from synchronous code.
+
+        :rtype: List of str
+        :return: List of URLs found or list of {"rank", "title", "description", "url"}
+        """
+
+        return asyncio.run(self.search())